@@ -0,0 +1,71 @@
+import os
+import json
+import logging
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+# Initialize logger
+logger = logging.getLogger("uvicorn")
+
+# Constants
+CACHE_DIR = Path(tempfile.gettempdir()) / "basile-bot"  # Only /tmp is writable on Lambda
+
+def _cache_file(name: str) -> Path:
+    return CACHE_DIR / f"{name}_cache.json"
+
+def load_cache(name: str) -> Dict[str, Any]:
+    """Load the cache state persisted under name, or an empty dict if there is none."""
+    try:
+        with open(_cache_file(name)) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable cache file {_cache_file(name)}: {e}")
+        return {}
+    if not isinstance(state, dict):
+        logger.warning(f"Ignoring malformed cache file {_cache_file(name)}")
+        return {}
+    return state
+
+def load_section(
+    state: Dict[str, Any],
+    key: str,
+    is_valid: Callable[[Any], bool],
+    keys: Optional[Iterable[str]] = None
+) -> Dict[str, Any]:
+    """
+    Return the entries of state[key] that pass is_valid, optionally only those
+    under keys. A malformed section or entry is treated as a cache miss.
+    """
+    section = state.get(key)
+    if not isinstance(section, dict):
+        return {}
+    allowed = None if keys is None else set(keys)
+    return {
+        k: v for k, v in section.items()
+        if (allowed is None or k in allowed) and is_valid(v)
+    }
+
+def is_timestamp(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def save_cache(name: str, state: Dict[str, Any]) -> None:
+    """Atomically persist cache state so new processes start with warm data."""
+    cache_file = _cache_file(name)
+    tmp_file = None
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # A unique temp file per write, so concurrent writers never share one
+        with tempfile.NamedTemporaryFile("w", dir=CACHE_DIR, prefix=f"{name}_", suffix=".tmp", delete=False) as f:
+            tmp_file = f.name
+            json.dump(state, f)
+        os.replace(tmp_file, cache_file)
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"Could not persist cache file {cache_file}: {e}")
+        if tmp_file:
+            try:
+                os.unlink(tmp_file)
+            except OSError:
+                pass
@@ -0,0 +1,49 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+from .github import pull_github
+from .linkedin import pull_linkedin
+from .resume import pull_resume
+
+# Initialize logger
+logger = logging.getLogger("uvicorn")
+
+# Constants
+CONTEXT_SOURCES = {
+    "resume": pull_resume,
+    "linkedin": pull_linkedin,
+    "github": pull_github,
+}
+
+def pull_context(bypass_cache: bool = False) -> Dict[str, str]:
+    """
+    Fetch the resume, LinkedIn and GitHub digests concurrently.
+
+    Args:
+        bypass_cache (bool): If True, bypass the caches and fetch fresh data
+
+    Returns:
+        Dict[str, str]: Digest text keyed by source name. A source that fails
+        maps to an empty string, matching the individual pull_* functions.
+    """
+    # Each source is independent network I/O, so wall-clock is the slowest one
+    with ThreadPoolExecutor(max_workers=len(CONTEXT_SOURCES)) as executor:
+        futures = {
+            name: executor.submit(pull, bypass_cache=bypass_cache)
+            for name, pull in CONTEXT_SOURCES.items()
+        }
+    return {name: future.result() for name, future in futures.items()}
+
+if __name__ == "__main__":
+    # Run as a module (python -m modules.context) so the relative imports resolve
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Fetch all profile context')
+    parser.add_argument('--fresh', action='store_true',
+                       help='Bypass cache and fetch fresh data')
+    args = parser.parse_args()
+
+    if args.fresh:
+        logger.info("Bypassing cache and fetching fresh data")
+
+    print("".join(pull_context(bypass_cache=args.fresh).values()))
@@ -1,45 +1,113 @@
+import time
 import boto3
-import json
+import orjson
+import asyncio
 import logging
+import threading
+from functools import lru_cache
 from botocore.config import Config
 from botocore.exceptions import ProfileNotFound
 
+try:
+    from ._cache import load_cache, save_cache
+except ImportError:  # Run directly as a script
+    from _cache import load_cache, save_cache
+
 # Initialize Uvicorn logger
 logger = logging.getLogger("uvicorn")
 
-def _get_clients():
-    """Initialize Bedrock clients with appropriate configuration."""
-    runtime_config = Config(
-        region_name='us-west-2',  # Always use us-west-2 for Bedrock
-        read_timeout=300,
-        connect_timeout=300,
-        retries={'max_attempts': 0}
-    )
-    
+@lru_cache(maxsize=1)
+def _session():
+    """Resolve the AWS credentials profile once and reuse the session."""
     try:
         # Try to use bedrock profile first
-        session = boto3.Session(profile_name='bedrock')
+        return boto3.Session(profile_name='bedrock')
     except ProfileNotFound:
         # Fall back to default credentials (IAM role or default profile)
-        session = boto3.Session()
-        
-    return (
-        session.client('bedrock', config=runtime_config),
-        session.client('bedrock-runtime', config=runtime_config)
-    )
+        return boto3.Session()
+
+RUNTIME_CONFIG = Config(
+    region_name='us-west-2',  # Always use us-west-2 for Bedrock
+    read_timeout=300,
+    connect_timeout=300,
+    retries={'max_attempts': 0}
+)
+
+# boto3 session and client creation are not thread-safe, and lru_cache does not stop
+# concurrent first calls (a chat request racing the prefetch) from both building one
+_clients = {}
+_CLIENT_LOCK = threading.Lock()
+
+def _client(service_name: str):
+    """Build each Bedrock client once, under a lock."""
+    client = _clients.get(service_name)
+    if client is None:
+        with _CLIENT_LOCK:
+            client = _clients.get(service_name)
+            if client is None:
+                client = _clients[service_name] = _session().client(service_name, config=RUNTIME_CONFIG)
+    return client
+
+def _get_runtime():
+    """Initialize the Bedrock runtime client on first use."""
+    return _client('bedrock-runtime')
+
+def _get_control_plane():
+    """Initialize the Bedrock control-plane client, which chat requests never need."""
+    return _client('bedrock')
+
+def warm_up() -> None:
+    """Build the runtime client ahead of the first chat request."""
+    _get_runtime()
 
-bedrock, runtime = _get_clients()
 MODEL_ID = "anthropic.claude-3-5-haiku-20241022-v1:0"
+STREAMING_CHECK_NAME = "bedrock_streaming"
+STREAMING_CHECK_DURATION = 86400  # Streaming support is a fixed model property; recheck daily
 
-def generate_stream(messages, max_gen_len=1024, temperature=0.9):
-    """Generate streaming responses from Bedrock."""
+# SSE framing, pre-encoded so each token only pays for escaping its text
+SSE_PREFIX = b'data: '
+SSE_SUFFIX = b'\n\n'
+SSE_DELTA_FRAME = SSE_PREFIX + b'{"choices":[{"delta":{"content":%b}}]}' + SSE_SUFFIX
+
+@lru_cache(maxsize=None)
+def _supports_streaming(model_id: str) -> bool:
+    """Check whether Bedrock can stream a model's responses, remembering the answer on disk."""
+    checked = load_cache(STREAMING_CHECK_NAME)
+    if not isinstance(checked, dict):
+        checked = {}
+    # Anything but a well-formed entry (e.g. a stale or hand-edited file) is a miss
+    entry = checked.get(model_id)
+    if (isinstance(entry, dict) and isinstance(entry.get("timestamp"), (int, float))
+            and isinstance(entry.get("supported"), bool)
+            and time.time() - entry["timestamp"] < STREAMING_CHECK_DURATION):
+        return entry["supported"]
+    
     try:
-        response = runtime.converse_stream(
+        model = _get_control_plane().get_foundation_model(modelIdentifier=model_id)
+        supported = model.get('modelDetails', {}).get('responseStreamingSupported', True)
+        checked[model_id] = {"timestamp": time.time(), "supported": supported}
+        save_cache(STREAMING_CHECK_NAME, checked)
+        return supported
+    except Exception as e:
+        # Don't let a control-plane outage block generation
+        logger.warning(f"Could not check streaming support for {model_id}: {str(e)}")
+        return True
+
+def _generate_frames(messages, max_gen_len, temperature, cancelled):
+    """Generate streaming responses from Bedrock as UTF-8 encoded SSE frames."""
+    try:
+        # Split system prompts from the conversation in a single pass
+        chat, system = [], []
+        for m in messages:
+            if m["role"] == "system":
+                system.append({"text": m["content"]})
+            else:
+                chat.append({"role": m["role"], "content": [{"text": m["content"]}]})
+
+        response = _get_runtime().converse_stream(
             modelId=MODEL_ID,
-            messages=[{"role": m["role"], "content": [{"text": m["content"]}]}
-                     for m in messages if m["role"] != "system"],
-            system=[{"text": m["content"]}
-                   for m in messages if m["role"] == "system"],
+            messages=chat,
+            system=system,
             inferenceConfig={
                 "maxTokens": max_gen_len,
                 "temperature": temperature
@@ -47,27 +115,64 @@ def generate_stream(messages, max_gen_len=1024, temperature=0.9):
         )
         
         for event in response.get('stream', []):
+            if cancelled.is_set():
+                response['stream'].close()
+                return
             text = event.get('contentBlockDelta', {}).get('delta', {}).get('text', '')
             if text:
-                chunk = {
-                    "choices": [{
-                        "delta": {
-                            "content": text
-                        }
-                    }]
-                }
-                yield f'data: {json.dumps(chunk)}\n\n'
+                yield SSE_DELTA_FRAME % orjson.dumps(text)
                 
-        yield 'data: [DONE]\n\n'
+        yield SSE_PREFIX + b'[DONE]' + SSE_SUFFIX
         
     except Exception as e:
         logger.error(f"Generation error: {str(e)}")
-        yield 'data: [ERROR]\n\n'
+        yield SSE_PREFIX + b'[ERROR]' + SSE_SUFFIX
+
+async def generate_stream(messages, max_gen_len=1024, temperature=0.9):
+    """
+    Stream SSE frames from Bedrock as an async generator.
+    
+    boto3 is blocking, so one worker thread drains the whole Bedrock stream into a
+    queue. Handing StreamingResponse a sync generator instead would cost a threadpool
+    round trip for every token.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    cancelled = threading.Event()
+    
+    def produce():
+        try:
+            for frame in _generate_frames(messages, max_gen_len, temperature, cancelled):
+                loop.call_soon_threadsafe(queue.put_nowait, frame)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+    
+    producer = loop.run_in_executor(None, produce)
+    try:
+        done = False
+        while not done:
+            # Send every frame that queued up while the last write was in flight as
+            # one chunk; a lone token still goes out without waiting for company
+            frames = [await queue.get()]
+            while not queue.empty():
+                frames.append(queue.get_nowait())
+            if frames[-1] is None:
+                frames.pop()
+                done = True
+            if frames:
+                yield b''.join(frames)
+    finally:
+        # Stop reading from Bedrock if the client disconnected mid-stream
+        cancelled.set()
+        await producer
 
 if __name__ == "__main__":
-    if bedrock.get_foundation_model(modelIdentifier=MODEL_ID).get('modelDetails', {}).get('responseStreamingSupported'):
-        for o in generate_stream([
+    async def main():
+        async for o in generate_stream([
             {"role": "user", "content": "Tell me a joke about computers."},
             {"role": "system", "content": "Be helpful and humorous."}
         ]):
-            print(o, end='', flush=True)
+            print(o.decode(), end='', flush=True)
+    
+    if _supports_streaming(MODEL_ID):
+        asyncio.run(main())
@@ -1,9 +1,20 @@
+import os
 import time
+import heapq
 import logging
 import argparse
-import requests
+import threading
+import httpx
 from collections import Counter
-from typing import List, Dict, Optional, Any
+from itertools import chain
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Any, Tuple
+
+try:
+    from ._cache import load_cache, save_cache, load_section, is_timestamp
+except ImportError:  # Run directly as a script
+    from _cache import load_cache, save_cache, load_section, is_timestamp
 
 # Initialize logger
 logger = logging.getLogger("uvicorn")
@@ -11,20 +22,66 @@ logger = logging.getLogger("uvicorn")
 # Constants
 USERNAME = "anotherbazeinthewall"
 BASE_URL = "https://api.github.com"
+GRAPHQL_URL = f"{BASE_URL}/graphql"
+GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN")  # GraphQL requires authentication
 TOP_REPOS_LIMIT = 5
 CACHE_DURATION = 3600  # 1 hour in seconds
+CACHE_NAME = "github"
+FETCH_WORKERS = 3  # One per endpoint fetched in pull_github
+CONNECT_RETRIES = 2
+# REST responses are trimmed to the keys the digest reads before caching
+REPO_KEYS = ("name", "full_name", "description", "html_url", "url", "updated_at", "language")
+EVENT_KEYS = ("type", "repo")
+CONTRIBUTION_EVENTS = frozenset(("PushEvent", "PullRequestEvent"))
+REPO_FIELDS = "nameWithOwner description url updatedAt isPrivate primaryLanguage { name }"
+PROFILE_QUERY = f"""
+query($login: String!) {{
+  user(login: $login) {{
+    repositories(first: 100, ownerAffiliations: OWNER, privacy: PUBLIC) {{ nodes {{ {REPO_FIELDS} }} }}
+    repositoriesContributedTo(first: 100, privacy: PUBLIC, contributionTypes: [COMMIT, PULL_REQUEST]) {{ nodes {{ {REPO_FIELDS} }} }}
+    starredRepositories(first: {TOP_REPOS_LIMIT}, orderBy: {{field: STARRED_AT, direction: DESC}}) {{ nodes {{ {REPO_FIELDS} }} }}
+  }}
+}}
+"""
 
 class GitHubAPI:
     """Handles GitHub API interactions and data processing."""
 
     def __init__(self, bypass_cache: bool = False) -> None:
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Accept': 'application/vnd.github.v3+json'
-        })
+        # HTTP/2 lets concurrent fetches share one multiplexed TLS connection
+        self.session = httpx.Client(
+            transport=httpx.HTTPTransport(http2=True, retries=CONNECT_RETRIES),
+            headers={'Accept': 'application/vnd.github.v3+json'}
+        )
+        if GITHUB_TOKEN:
+            self.session.headers['Authorization'] = f'bearer {GITHUB_TOKEN}'
         self._cache = {}
         self._cache_timestamps = {}
+        self._cache_etags = {}
+        self._cache_lock = threading.Lock()
         self.bypass_cache = bypass_cache
+        self._load_cache()
+    
+    def _load_cache(self) -> None:
+        """Restore responses persisted by a previous process."""
+        stored = load_cache(CACHE_NAME)
+        self._cache = load_section(stored, "data", lambda value: True)
+        # Timestamps and ETags are only meaningful for entries that were restored
+        self._cache_timestamps = load_section(stored, "timestamps", is_timestamp, self._cache)
+        self._cache_etags = load_section(stored, "etags", lambda etag: isinstance(etag, str), self._cache)
+    
+    def _save_cache(self) -> None:
+        """Persist cached responses so new processes start with warm data."""
+        save_cache(CACHE_NAME, {
+            "data": self._cache,
+            "timestamps": self._cache_timestamps,
+            "etags": self._cache_etags
+        })
+    
+    def expire_cache(self) -> None:
+        """Mark all cached entries stale while keeping the session and ETags."""
+        with self._cache_lock:
+            self._cache_timestamps.clear()
     
     def _is_cache_valid(self, cache_key: str) -> bool:
         """Check if cached data is still valid."""
@@ -37,13 +94,23 @@ class GitHubAPI:
         elapsed_time = time.time() - self._cache_timestamps[cache_key]
         return elapsed_time < CACHE_DURATION
     
-    def _fetch_url(self, url: str, cache_key: str = None) -> Optional[Any]:
+    def _fetch_url(
+        self,
+        url: str,
+        cache_key: str = None,
+        payload: Optional[Dict] = None,
+        keys: Optional[Tuple[str, ...]] = None
+    ) -> Optional[Any]:
         """
         Fetch data from a GitHub API endpoint with time-based caching.
+        Expired GET entries are revalidated with If-None-Match, so an unchanged
+        resource costs a bodiless 304 that does not count against the rate limit.
         
         Args:
             url (str): The API endpoint URL
             cache_key (str): Optional key for caching the response
+            payload (dict): Optional JSON body; when given the request is a POST
+            keys (tuple): Optional keys to keep from each item of a list response
         
         Returns:
             Optional[Any]: JSON response data or None if request fails
@@ -54,17 +121,39 @@ class GitHubAPI:
                 return self._cache[cache_key]
             logger.info(f"Fetching fresh data for {cache_key}")
 
+        headers = {}
+        if cache_key in self._cache and cache_key in self._cache_etags:
+            headers['If-None-Match'] = self._cache_etags[cache_key]
+
         try:
-            response = self.session.get(url)
+            if payload is None:
+                response = self.session.get(url, headers=headers)
+            else:
+                response = self.session.post(url, json=payload)
+            
+            if response.status_code == 304:
+                logger.info(f"Cached data for {cache_key} not modified")
+                with self._cache_lock:
+                    self._cache_timestamps[cache_key] = time.time()
+                    self._save_cache()
+                return self._cache[cache_key]
+            
             response.raise_for_status()
             data = response.json()
+            if keys and isinstance(data, list):
+                data = [{key: item[key] for key in keys if key in item} for item in data]
             
-            if cache_key:
-                self._cache[cache_key] = data
-                self._cache_timestamps[cache_key] = time.time()
+            # GraphQL reports failures in a 200 body; those must not be cached
+            if cache_key and not (isinstance(data, dict) and data.get("errors")):
+                with self._cache_lock:
+                    self._cache[cache_key] = data
+                    self._cache_timestamps[cache_key] = time.time()
+                    if response.headers.get('ETag'):
+                        self._cache_etags[cache_key] = response.headers['ETag']
+                    self._save_cache()
             
             return data
-        except requests.exceptions.RequestException as e:
+        except (httpx.HTTPError, ValueError) as e:
             logger.error(f"Error fetching URL {url}: {e}")
             return None
     
@@ -72,19 +161,19 @@ class GitHubAPI:
         """Fetch user's owned repositories."""
         url = f"{BASE_URL}/users/{USERNAME}/repos?type=owner&per_page=100"
         cache_key = f"repos_{USERNAME}"
-        return self._fetch_url(url, cache_key=cache_key) or []
+        return self._fetch_url(url, cache_key=cache_key, keys=REPO_KEYS) or []
 
     def get_contributed_repos(self) -> List[Dict]:
         """Fetch repositories the user has contributed to."""
         url = f"{BASE_URL}/users/{USERNAME}/events/public"
         cache_key = f"contributed_{USERNAME}"
-        events = self._fetch_url(url, cache_key=cache_key)
+        events = self._fetch_url(url, cache_key=cache_key, keys=EVENT_KEYS)
         if not events:
             return []
         
         contributed_repos = {}
         for event in events:
-            if event.get("type") in ["PushEvent", "PullRequestEvent"]:
+            if event.get("type") in CONTRIBUTION_EVENTS:
                 repo = event.get("repo")
                 if repo:
                     contributed_repos[repo["name"]] = {
@@ -97,8 +186,40 @@ class GitHubAPI:
         """Fetch repositories starred by the user."""
         url = f"{BASE_URL}/users/{USERNAME}/starred"
         cache_key = f"starred_{USERNAME}"
-        return self._fetch_url(url, cache_key=cache_key) or []
+        return self._fetch_url(url, cache_key=cache_key, keys=REPO_KEYS) or []
     
+    def get_profile(self) -> Optional[Tuple[List[Dict], List[Dict], List[Dict]]]:
+        """
+        Fetch owned, contributed and starred repositories in one GraphQL query.
+        
+        Returns:
+            Optional[tuple]: (own_repos, contributed_repos, starred_repos) shaped
+            like the REST responses, or None if the query fails
+        """
+        payload = {"query": PROFILE_QUERY, "variables": {"login": USERNAME}}
+        data = self._fetch_url(GRAPHQL_URL, cache_key=f"profile_{USERNAME}", payload=payload)
+        user = ((data or {}).get("data") or {}).get("user")
+        if not user:
+            logger.error(f"GraphQL profile query failed: {(data or {}).get('errors')}")
+            return None
+        
+        def to_rest(node: Dict) -> Dict:
+            return {
+                "full_name": node["nameWithOwner"],
+                "description": node.get("description"),
+                "html_url": node["url"],
+                "url": node["url"],
+                "updated_at": node.get("updatedAt", ""),
+                "language": (node.get("primaryLanguage") or {}).get("name"),
+            }
+        
+        # The token can see private repos, which must never reach the public prompt;
+        # starred repos cannot be filtered in the query itself
+        return tuple(
+            [to_rest(node) for node in user[field]["nodes"] if node and not node.get("isPrivate")]
+            for field in ("repositories", "repositoriesContributedTo", "starredRepositories")
+        )
+
     # def get_readme(self, repo_name: str = "basile-bot") -> Optional[str]:
     #     """Fetch README content for a specific repository."""
     #     url = f"{BASE_URL}/repos/{USERNAME}/{repo_name}/readme"
@@ -114,31 +235,31 @@ class GitHubDigest:
     """Processes and formats GitHub data into a readable digest."""
 
     @staticmethod
-    def merge_repos(own_repos: List[Dict], contributed_repos: List[Dict]) -> List[Dict]:
-        """Merge owned and contributed repositories without duplicates."""
-        repo_dict = {repo.get("url"): repo for repo in own_repos}
-        for repo in contributed_repos:
-            if repo.get("url") not in repo_dict:
-                repo_dict[repo.get("url")] = repo
-        return list(repo_dict.values())
-    
-    @staticmethod
-    def get_top_active_repos(repos: List[Dict], limit: int = TOP_REPOS_LIMIT) -> List[Dict]:
-        """Get the most recently active repositories."""
-        sorted_repos = sorted(
-            repos,
-            key=lambda repo: repo.get('updated_at', ''),
-            reverse=True
-        )
-        return sorted_repos[:limit]
+    def get_top_active_repos(
+        own_repos: List[Dict],
+        contributed_repos: List[Dict],
+        limit: int = TOP_REPOS_LIMIT
+    ) -> List[Dict]:
+        """Get the most recently active owned and contributed repositories without duplicates."""
+        seen_urls = set()
+
+        def unique_repos():
+            for repo in chain(own_repos, contributed_repos):
+                url = repo.get("url")
+                if url not in seen_urls:
+                    seen_urls.add(url)
+                    yield repo
+
+        return heapq.nlargest(limit, unique_repos(), key=lambda repo: repo.get('updated_at', ''))
     
     @staticmethod
     def get_languages(repos: List[Dict]) -> Counter:
         """Calculate language usage statistics."""
-        return Counter(
-            repo["language"] for repo in repos
-            if repo.get("language")
-        )
+        # Every repo payload carries a language key (null when undetected), since
+        # REPO_KEYS keeps it on REST payloads and the GraphQL mapping always sets it
+        language_stats = Counter(map(itemgetter("language"), repos))
+        language_stats.pop(None, None)
+        return language_stats
     
     @staticmethod
     def format_digest(
@@ -209,27 +330,34 @@ def pull_github(bypass_cache: bool = False) -> str:
              languages, and starred repos.
     """
     try:
-        # Use the module-level instance instead of creating a new one
-        global github_api
+        # Reuse the module-level instance so its connection pool stays warm
         if bypass_cache:
-            github_api = GitHubAPI(bypass_cache=True)
+            github_api.expire_cache()
         
         digest = GitHubDigest()
         
-        # Fetch data
-        own_repos = github_api.get_repos()
-        contributed_repos = github_api.get_contributed_repos()
-        starred_repos = github_api.get_starred_repos()
+        # Fetch data in a single GraphQL round-trip when authenticated
+        profile = github_api.get_profile() if GITHUB_TOKEN else None
+        if profile:
+            own_repos, contributed_repos, starred_repos = profile
+        else:
+            # Otherwise fetch concurrently; the three REST endpoints are independent
+            with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+                own_future = executor.submit(github_api.get_repos)
+                contributed_future = executor.submit(github_api.get_contributed_repos)
+                starred_future = executor.submit(github_api.get_starred_repos)
+            own_repos = own_future.result()
+            contributed_repos = contributed_future.result()
+            starred_repos = starred_future.result()
 
         # readme_content = api.get_readme()  # Fetch README
 
-        # If any of the data fetches failed, return an empty string
-        if not own_repos or not contributed_repos or not starred_repos:
+        # Render whatever succeeded; only give up if every fetch failed
+        if not own_repos and not contributed_repos and not starred_repos:
             return ""
 
         # Process data
-        all_repos = digest.merge_repos(own_repos, contributed_repos)
-        top_active_repos = digest.get_top_active_repos(all_repos)
+        top_active_repos = digest.get_top_active_repos(own_repos, contributed_repos)
         language_stats = digest.get_languages(own_repos)
 
         # Format output
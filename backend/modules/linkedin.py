@@ -1,10 +1,17 @@
 import re
+import html as html_lib
 import time
 import requests
 import logging
-from bs4 import BeautifulSoup
+import threading
+from requests.adapters import HTTPAdapter
 from typing import Optional, Dict, Any
 
+try:
+    from ._cache import load_cache, save_cache, load_section, is_timestamp
+except ImportError:  # Run directly as a script
+    from _cache import load_cache, save_cache, load_section, is_timestamp
+
 # Initialize logger
 logger = logging.getLogger("uvicorn")
 
@@ -17,16 +24,71 @@ USER_AGENT = (
 )
 SEARCH_QUERY = "site:linkedin.com/in awbasile"
 CACHE_DURATION = 3600  # 1 hour in seconds
+CACHE_NAME = "linkedin"
+REQUEST_TIMEOUT = 10  # seconds
+MAX_BACKOFF = 3600  # Cap on the retry delay after repeated failures, in seconds
+# Bounded, quote-delimited spans keep matching linear on large result pages
+_SNIPPET_RE = re.compile(r'"Technical Program Manager[^"]{0,400}?SaaS environments[^"]{0,200}?"')
+_FOLLOWERS_RE = re.compile(r'(\d{1,3}\+?)\s+followers', re.IGNORECASE)
+# Fast path for the first result; anything with nested markup falls back to a parser
+_RESULT_RE = re.compile(r'<div\b[^>]*\bclass="[^"]*\btF2Cxc\b[^"]*"[^>]*>')
+_ANCHOR_START_RE = re.compile(r'<a[\s>]')
+_H3_RE = re.compile(r'<h3[^>]*>([^<]+)</h3>')
+_HREF_RE = re.compile(r'<a\s(?:[^>]*?\s)?href="([^"]+)"')
+
+# Prefer the C-backed lxml parser, falling back to the stdlib parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# The Lexbor C parser is fastest; BeautifulSoup remains the fallback
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# Shared by every LinkedInAPI instance so pooled connections outlive cache bypasses
+_SESSION = requests.Session()
+_SESSION.headers.update({"User-Agent": USER_AGENT})
+for _scheme in ("http://", "https://"):
+    _SESSION.mount(_scheme, HTTPAdapter(pool_connections=1, pool_maxsize=4))
 
 class LinkedInAPI:
     """Handles LinkedIn data fetching and caching."""
     
+    __slots__ = ("session", "_cache", "_cache_timestamps", "_cache_lock",
+                 "bypass_cache", "_failure_count", "_next_retry_at")
+    
     def __init__(self, bypass_cache: bool = False) -> None:
-        self.session = requests.Session()
-        self.session.headers.update({"User-Agent": USER_AGENT})
+        self.session = _SESSION
         self._cache = {}
         self._cache_timestamps = {}
+        self._cache_lock = threading.Lock()
         self.bypass_cache = bypass_cache
+        self._failure_count = 0
+        self._next_retry_at = 0.0
+        self._load_cache()
+    
+    def _load_cache(self) -> None:
+        """Restore responses persisted by a previous process."""
+        stored = load_cache(CACHE_NAME)
+        self._cache = load_section(stored, "data", lambda html: isinstance(html, str))
+        # Timestamps are only meaningful for entries that were restored
+        self._cache_timestamps = load_section(stored, "timestamps", is_timestamp, self._cache)
+    
+    def _save_cache(self) -> None:
+        """Persist cached responses so new processes start with warm data."""
+        save_cache(CACHE_NAME, {
+            "data": self._cache,
+            "timestamps": self._cache_timestamps
+        })
+    
+    def expire_cache(self) -> None:
+        """Mark all cached entries stale while keeping the session and stale copies."""
+        with self._cache_lock:
+            self._cache_timestamps.clear()
     
     def _is_cache_valid(self, cache_key: str) -> bool:
         """Check if cached data is still valid."""
@@ -47,18 +109,32 @@ class LinkedInAPI:
                 return self._cache[cache_key]
             logger.info(f"Fetching fresh data for {cache_key}")
         
+        # Google rate-limits scrapers; stay off the network until the backoff elapses
+        if time.time() < self._next_retry_at:
+            logger.warning(f"Skipping fetch of {url} during backoff")
+            return self._cache.get(cache_key)
+        
         try:
-            response = self.session.get(url)
+            response = self.session.get(url, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
             data = response.text
+            self._failure_count = 0
             
             if cache_key:
-                self._cache[cache_key] = data
-                self._cache_timestamps[cache_key] = time.time()
+                with self._cache_lock:
+                    self._cache[cache_key] = data
+                    self._cache_timestamps[cache_key] = time.time()
+                    self._save_cache()
             
             return data
         except requests.RequestException as e:
             logger.error(f"Error fetching URL {url}: {e}")
+            self._next_retry_at = time.time() + min(MAX_BACKOFF, 2 ** self._failure_count)
+            self._failure_count += 1
+            if cache_key in self._cache:
+                # Stale data beats no data when the upstream is unavailable
+                logger.warning(f"Serving stale cached data for {cache_key}")
+                return self._cache[cache_key]
             return None
     
     def fetch_google_results(self) -> Optional[str]:
@@ -69,6 +145,38 @@ class LinkedInAPI:
 # Create a module-level instance
 linkedin_api = LinkedInAPI()
 
+def _extract_first_result(html: str) -> tuple[str, str]:
+    """Extract the title and link of the first Google search result."""
+    result = _RESULT_RE.search(html)
+    if result:
+        # Only look inside the first result, up to where the next one starts
+        next_result = _RESULT_RE.search(html, result.end())
+        end = next_result.start() if next_result else len(html)
+        # The first h3 and first anchor must themselves match, as the parsers would pick them
+        heading_start = html.find('<h3', result.end(), end)
+        anchor_start = _ANCHOR_START_RE.search(html, result.end(), end)
+        heading = _H3_RE.match(html, heading_start, end) if heading_start != -1 else None
+        anchor = _HREF_RE.match(html, anchor_start.start(), end) if anchor_start else None
+        if heading and anchor:
+            return html_lib.unescape(heading.group(1)), html_lib.unescape(anchor.group(1))
+    
+    if LexborHTMLParser:
+        first_result = LexborHTMLParser(html).css_first("div.tF2Cxc")
+        heading = first_result.css_first("h3") if first_result else None
+        anchor = first_result.css_first("a") if first_result else None
+        title = heading.text() if heading else None
+        link = anchor.attributes.get("href") if anchor else None
+    else:
+        # Imported lazily: bs4 only loads when Lexbor is unavailable
+        from bs4 import BeautifulSoup
+        first_result = BeautifulSoup(html, HTML_PARSER).select_one("div.tF2Cxc")
+        heading = first_result.find("h3") if first_result else None
+        anchor = first_result.find("a") if first_result else None
+        title = heading.text if heading else None
+        link = anchor.get("href") if anchor else None
+    
+    return title or "No title found", link or "No link found"
+
 def _extract_profile_data(html: str) -> tuple[str, str, str, str]:
     """
     Extract LinkedIn profile data from Google search results.
@@ -77,22 +185,16 @@ def _extract_profile_data(html: str) -> tuple[str, str, str, str]:
     Returns:
         tuple: (title, link, snippet, followers)
     """
-    soup = BeautifulSoup(html, "html.parser")
-    results = soup.find_all("div", class_="tF2Cxc")
-    
     # Extract basic info
-    first_result = results[0] if results else None
-    title = first_result.find("h3").text if first_result and first_result.find("h3") else "No title found"
-    link = first_result.find("a")["href"] if first_result and first_result.find("a") else "No link found"
+    title, link = _extract_first_result(html)
     
-    # Extract snippet
-    snippet_matches = re.findall(r'"Technical Program Manager.*?SaaS environments.*?"', html)
-    snippets = list(set(match.strip('"') for match in snippet_matches))
-    snippet = snippets[0] if snippets else "No description found"
+    # Only one match of each is used, so stop scanning at the first rather than
+    # collecting every match across the whole page
+    snippet_match = _SNIPPET_RE.search(html)
+    snippet = snippet_match.group(0).strip('"') if snippet_match else "No description found"
     
-    # Extract follower count
-    follower_matches = re.findall(r'(\d{1,3}\+?)\s+followers', html, re.IGNORECASE)
-    followers = follower_matches[0] if follower_matches else "Not available"
+    follower_match = _FOLLOWERS_RE.search(html)
+    followers = follower_match.group(1) if follower_match else "Not available"
     
     return title, link, snippet, followers
 
@@ -107,10 +209,9 @@ def pull_linkedin(bypass_cache: bool = False) -> str:
         str: A summary of the user's LinkedIn profile. Returns an empty string if any error occurs.
     """
     try:
-        # Use the module-level instance
-        global linkedin_api
+        # Reuse the module-level instance so its pooled connections stay warm
         if bypass_cache:
-            linkedin_api = LinkedInAPI(bypass_cache=True)
+            linkedin_api.expire_cache()
         
         # Fetch search results
         html = linkedin_api.fetch_google_results()
@@ -1,11 +1,19 @@
 import io
 import re
 import time
+import base64
+import html as html_lib
+import hashlib
 import logging
+import threading
 import requests
-from typing import List, Optional
-from bs4 import BeautifulSoup
-from pypdf import PdfReader
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional
+
+try:
+    from ._cache import load_cache, save_cache, load_section, is_timestamp
+except ImportError:  # Run directly as a script
+    from _cache import load_cache, save_cache, load_section, is_timestamp
 
 # Initialize logger
 logger = logging.getLogger("uvicorn")
@@ -13,21 +21,109 @@ logger = logging.getLogger("uvicorn")
 # Constants
 BASE_URL = "https://resume.alexbasile.com"
 CACHE_DURATION = 3600  # 1 hour in seconds
-SECTION_KEYWORDS = {'experience', 'education', 'skills', 'projects', 'contact'}
-MONTHS = {
+REQUEST_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+CACHE_NAME = "resume"
+PDF_CACHE_KEY = "resume_pdf_content"
+SECTION_KEYWORDS = frozenset({'experience', 'education', 'skills', 'projects', 'contact'})
+MONTHS = frozenset({
     'january', 'february', 'march', 'april', 'may', 'june',
     'july', 'august', 'september', 'october', 'november', 'december'
-}
+})
+_SECTION_RE = re.compile('|'.join(SECTION_KEYWORDS), re.IGNORECASE)
+# Subsections carry a date: a year in the 2000s or a month name
+_SUBSECTION_RE = re.compile('|'.join(['20', *MONTHS]), re.IGNORECASE)
+_META_URL_RE = re.compile(r'url=(.+)', re.IGNORECASE)  # Authors write both url= and URL=
+# Fast path for the redirect page: the meta refresh tag outside comments, then its
+# content attribute; attribute names and the refresh value are matched whole
+_HTML_COMMENT_RE = re.compile(r'<!--.*?-->', re.DOTALL)
+_META_REFRESH_RE = re.compile(r'<meta\s[^>]*?(?<=\s)http-equiv\s*=\s*["\']?refresh(?=["\'\s/>])[^>]*>', re.IGNORECASE)
+_CONTENT_ATTR_RE = re.compile(r'(?<=\s)content\s*=\s*(["\'])(.*?)\1', re.IGNORECASE | re.DOTALL)
+_HEAD_END_RE = re.compile(rb'</head\s*>', re.IGNORECASE)
+HEAD_CHUNK_SIZE = 4096
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Conditional request headers keyed to the response headers that supply their values
+VALIDATOR_HEADERS = {"If-None-Match": "ETag", "If-Modified-Since": "Last-Modified"}
+PARSED_CACHE_SIZE = 4
+
+# Prefer the C-backed lxml parser, falling back to the stdlib parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# The Lexbor C parser is fastest; BeautifulSoup remains the fallback
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# PDFium (C++) extracts text far faster than pure-Python pypdf, which stays as the fallback
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+# PDFium is not thread-safe, so concurrent parses take turns
+_PDFIUM_LOCK = threading.Lock()
+# Guards ResumeParser's shared memo; context pulls parse on worker threads
+_PARSED_CACHE_LOCK = threading.Lock()
+
+# Shared by every ResumeFetcher instance so pooled connections outlive cache bypasses
+_SESSION = requests.Session()
+for _scheme in ("http://", "https://"):
+    _SESSION.mount(_scheme, HTTPAdapter(pool_connections=2, pool_maxsize=4))
+
+def _is_validator_entry(entry) -> bool:
+    """Check a persisted validator entry has the {"url", "headers"} shape _fetch_url reads."""
+    return (
+        isinstance(entry, dict)
+        and isinstance(entry.get("url"), str)
+        and isinstance(entry.get("headers"), dict)
+        and all(isinstance(value, str) for value in entry["headers"].values())
+    )
 
 class ResumeFetcher:
     """Handles fetching and extracting PDF content from URL with caching."""
     
+    __slots__ = ("base_url", "session", "_cache", "_cache_timestamps",
+                 "_cache_validators", "_cache_lock", "bypass_cache")
+    
     def __init__(self, base_url: str = BASE_URL, bypass_cache: bool = False):
         self.base_url = base_url
-        self.session = requests.Session()
+        self.session = _SESSION
         self._cache = {}
         self._cache_timestamps = {}
+        self._cache_validators = {}
+        self._cache_lock = threading.Lock()
         self.bypass_cache = bypass_cache
+        self._load_cache()
+    
+    def _load_cache(self) -> None:
+        """Restore responses persisted by a previous process."""
+        stored = load_cache(CACHE_NAME)
+        # Cached bodies are raw bytes, stored base64-encoded in the JSON file
+        for key, value in load_section(stored, "data", lambda value: isinstance(value, str)).items():
+            try:
+                self._cache[key] = base64.b64decode(value, validate=True)
+            except ValueError as e:
+                logger.warning(f"Ignoring corrupt resume cache entry {key}: {e}")
+        # Timestamps and validators are only meaningful for entries that were restored
+        self._cache_timestamps = load_section(stored, "timestamps", is_timestamp, self._cache)
+        self._cache_validators = load_section(stored, "validators", _is_validator_entry, self._cache)
+    
+    def _save_cache(self) -> None:
+        """Persist cached responses so new processes start with warm data."""
+        save_cache(CACHE_NAME, {
+            "data": {key: base64.b64encode(value).decode("ascii") for key, value in self._cache.items()},
+            "timestamps": self._cache_timestamps,
+            "validators": self._cache_validators
+        })
+    
+    def expire_cache(self) -> None:
+        """Mark all cached entries stale while keeping the session, stale copies and validators."""
+        with self._cache_lock:
+            self._cache_timestamps.clear()
     
     def _is_cache_valid(self, cache_key: str) -> bool:
         """Check if cached data is still valid."""
@@ -41,40 +137,98 @@ class ResumeFetcher:
         return elapsed_time < CACHE_DURATION
     
     def _fetch_url(self, url: str, cache_key: str = None) -> Optional[bytes]:
-        """Fetch data from URL with caching."""
+        """
+        Fetch data from URL with caching. Expired entries are revalidated with
+        their ETag and Last-Modified, so an unchanged file costs a bodiless 304.
+        """
         if cache_key:
             if self._is_cache_valid(cache_key):
                 logger.info(f"Using cached data for {cache_key}")
                 return self._cache[cache_key]
             logger.info(f"Fetching fresh data for {cache_key}")
         
+        # Validators only apply to the URL they came from; the resume may move
+        headers = {}
+        validators = self._cache_validators.get(cache_key)
+        if cache_key in self._cache and validators and validators["url"] == url:
+            headers = validators["headers"]
+        
         try:
-            response = self.session.get(url)
-            response.raise_for_status()
-            data = response.content
+            # Stream the body into one buffer instead of joining chunks via response.content
+            with self.session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+                if response.status_code == 304:
+                    logger.info(f"Cached data for {cache_key} not modified")
+                    with self._cache_lock:
+                        self._cache_timestamps[cache_key] = time.time()
+                        self._save_cache()
+                    return self._cache[cache_key]
+                
+                response.raise_for_status()
+                buffer = io.BytesIO()
+                # iter_content keeps requests' exception wrapping for timeouts and truncated bodies
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    buffer.write(chunk)
+            # getvalue() hands over the buffer without copying it
+            data = buffer.getvalue()
             
             if cache_key:
-                self._cache[cache_key] = data
-                self._cache_timestamps[cache_key] = time.time()
+                with self._cache_lock:
+                    self._cache[cache_key] = data
+                    self._cache_timestamps[cache_key] = time.time()
+                    self._cache_validators[cache_key] = {"url": url, "headers": {
+                        request_header: response.headers[response_header]
+                        for request_header, response_header in VALIDATOR_HEADERS.items()
+                        if response_header in response.headers
+                    }}
+                    self._save_cache()
             
             return data
         except requests.RequestException as e:
             logger.error(f"Error fetching URL {url}: {e}")
+            if cache_key in self._cache:
+                # Stale data beats no data when the upstream is unavailable
+                logger.warning(f"Serving stale cached data for {cache_key}")
+                return self._cache[cache_key]
             return None
     
+    @staticmethod
+    def _find_meta_refresh(html: str) -> Optional[str]:
+        """Return the content attribute of the page's meta refresh tag."""
+        tag = _META_REFRESH_RE.search(_HTML_COMMENT_RE.sub('', html))
+        content = _CONTENT_ATTR_RE.search(tag.group(0)) if tag else None
+        if content and _META_URL_RE.search(content.group(2)):
+            return html_lib.unescape(content.group(2))
+        
+        # Unusual markup (e.g. an unquoted content attribute, or content without a
+        # URL) goes to a real parser
+        if LexborHTMLParser:
+            meta_refresh = LexborHTMLParser(html).css_first('meta[http-equiv="refresh"]')
+            return meta_refresh.attributes.get('content') if meta_refresh else None
+        
+        # Imported lazily: bs4 only loads when Lexbor is unavailable
+        from bs4 import BeautifulSoup
+        meta_refresh = BeautifulSoup(html, HTML_PARSER).find('meta', attrs={'http-equiv': 'refresh'})
+        return meta_refresh.get('content') if meta_refresh else None
+    
     def _get_pdf_url(self) -> Optional[str]:
         """Extract PDF URL from the base page."""
         try:
-            response = self.session.get(self.base_url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            meta_refresh = soup.find('meta', attrs={'http-equiv': 'refresh'})
+            chunks = []
+            with self.session.get(self.base_url, stream=True, timeout=REQUEST_TIMEOUT) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=HEAD_CHUNK_SIZE):
+                    chunks.append(chunk)
+                    # The meta refresh tag lives in <head>, so skip downloading the body
+                    if _HEAD_END_RE.search(chunk):
+                        break
+                encoding = response.encoding or "utf-8"
+            refresh_content = self._find_meta_refresh(b"".join(chunks).decode(encoding, errors="replace"))
             
-            if not meta_refresh or 'content' not in meta_refresh.attrs:
+            if not refresh_content:
                 logger.error("No meta refresh tag found in base page")
                 return None
                 
-            pdf_path = re.search(r'url=(.+)', meta_refresh['content'])
+            pdf_path = _META_URL_RE.search(refresh_content)
             if not pdf_path:
                 logger.error("No PDF URL found in meta refresh content")
                 return None
@@ -86,50 +240,81 @@ class ResumeFetcher:
     
     def get_pdf_content(self) -> Optional[bytes]:
         """Fetch PDF content from the URL with caching."""
+        # A fresh cached PDF makes resolving its URL unnecessary
+        if self._is_cache_valid(PDF_CACHE_KEY):
+            logger.info(f"Using cached data for {PDF_CACHE_KEY}")
+            return self._cache[PDF_CACHE_KEY]
+        
         pdf_url = self._get_pdf_url()
         if not pdf_url:
+            if PDF_CACHE_KEY in self._cache:
+                logger.warning(f"Serving stale cached data for {PDF_CACHE_KEY}")
+                return self._cache[PDF_CACHE_KEY]
             return None
         
-        return self._fetch_url(pdf_url, cache_key="resume_pdf_content")
+        return self._fetch_url(pdf_url, cache_key=PDF_CACHE_KEY)
 
 # Create a module-level instance
 resume_fetcher = ResumeFetcher()
 
+def _extract_page_texts(pdf_content: bytes) -> List[str]:
+    """Return the text of each page in the PDF."""
+    if pdfium:
+        with _PDFIUM_LOCK:
+            pdf = pdfium.PdfDocument(pdf_content)
+            try:
+                return [page.get_textpage().get_text_bounded() for page in pdf]
+            finally:
+                pdf.close()
+    
+    # Imported lazily so pypdf loads on the first parse, not at startup
+    from pypdf import PdfReader
+    return [page.extract_text() for page in PdfReader(io.BytesIO(pdf_content)).pages]
+
 class ResumeParser:
     """Handles parsing and formatting of PDF resume content."""
     
+    __slots__ = ()
+    
     @staticmethod
     def is_section_header(line: str) -> bool:
         """Check if a line is likely a section header."""
-        line_lower = line.lower()
-        return (
-            line.isupper() or
-            (len(line) < 40 and any(
-                keyword in line_lower for keyword in SECTION_KEYWORDS
-            ))
-        )
+        return line.isupper() or (len(line) < 40 and _SECTION_RE.search(line) is not None)
     
     @staticmethod
     def is_subsection(line: str) -> bool:
         """Check if a line is likely a subsection (e.g., job title/date)."""
-        line_lower = line.lower()
-        return (
-            len(line) < 50 and
-            ('20' in line or any(
-                month in line_lower for month in MONTHS
-            ))
-        )
+        return len(line) < 50 and _SUBSECTION_RE.search(line) is not None
+    
+    # Parsed text keyed by PDF digest; a changed PDF hashes to a new key
+    _parsed_cache: Dict[bytes, str] = {}
     
     def parse_pdf(self, pdf_content: bytes) -> str:
-        """Parse PDF content and format it as readable text."""
+        """Parse PDF content and format it as readable text, memoized per PDF."""
+        digest = hashlib.blake2b(pdf_content, digest_size=16).digest()
+        with _PARSED_CACHE_LOCK:
+            cached = self._parsed_cache.get(digest)
+        if cached is not None:
+            return cached
+        
+        # Parse outside the lock; extraction already serializes on _PDFIUM_LOCK
+        formatted_text = self._parse_pdf(pdf_content)
+        if formatted_text:
+            with _PARSED_CACHE_LOCK:
+                if digest not in self._parsed_cache and len(self._parsed_cache) >= PARSED_CACHE_SIZE:
+                    # Evict the oldest entry; dicts preserve insertion order
+                    self._parsed_cache.pop(next(iter(self._parsed_cache)))
+                self._parsed_cache[digest] = formatted_text
+        return formatted_text
+    
+    def _parse_pdf(self, pdf_content: bytes) -> str:
+        """Extract and format the text of every page in the PDF."""
         try:
-            pdf_file = io.BytesIO(pdf_content)
-            reader = PdfReader(pdf_file)
             formatted_sections = []
             current_section = []
             
-            for page in reader.pages:
-                text = page.extract_text()
+            for text in _extract_page_texts(pdf_content):
+                # PDFium ends lines with \r\n; strip() below drops the \r
                 lines = text.split('\n')
                 
                 for line in lines:
@@ -150,9 +335,9 @@ class ResumeParser:
             if current_section:
                 formatted_sections.append('\n'.join(current_section))
             
-            # Join and clean up the text
-            final_text = '\n'.join(formatted_sections)
-            return re.sub(r'\n\s*\n', '\n\n', final_text)
+            # Lines are stripped and non-empty, so the only blank lines are the
+            # single ones the header and subsection prefixes introduce
+            return '\n'.join(formatted_sections)
         except Exception as e:
             logger.error(f"Error parsing PDF content: {e}")
             return ""
@@ -169,10 +354,9 @@ def pull_resume(bypass_cache: bool = False) -> str:
         Returns an empty string if any error occurs.
     """
     try:
-        # Use the module-level instance
-        global resume_fetcher
+        # Reuse the module-level instance so its pooled connections stay warm
         if bypass_cache:
-            resume_fetcher = ResumeFetcher(bypass_cache=True)
+            resume_fetcher.expire_cache()
         
         # Fetch PDF content
         pdf_content = resume_fetcher.get_pdf_content()
@@ -1,23 +1,190 @@
+import os
+import gzip
+import asyncio
+import time
 import datetime
 import logging
-import json
+import hashlib
+import mimetypes
+import orjson
 from pathlib import Path
-from pydantic import BaseModel
-from fastapi import FastAPI, HTTPException
+from functools import partial
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response, FileResponse, StreamingResponse
-from modules import pull_resume, pull_linkedin, pull_github, get_prompt_config, generate_stream
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from modules import CONTEXT_SOURCES, pull_context, get_prompt_config, generate_stream, warm_up
 
 logger = logging.getLogger("uvicorn")
 
-class Message(BaseModel):
-    role: str
-    content: str
+# Brotli is optional; without it text is precompressed with gzip only
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
-class ChatRequest(BaseModel):
-    messages: list[Message]
+# Content codings in order of preference
+PREFERRED_ENCODINGS = ("br", "gzip")
+# Digests are rebuilt hourly, so they trade a little ratio for faster compression
+DIGEST_BROTLI_QUALITY = 6
 
-app = FastAPI()
+def _compress(body: bytes, brotli_quality: int = 11) -> dict[str, bytes]:
+    """Return each content coding of body that actually comes out smaller."""
+    compressed = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli:
+        compressed["br"] = brotli.compress(body, quality=brotli_quality)
+    return {encoding: data for encoding, data in compressed.items() if len(data) < len(body)}
+
+def _negotiate_encoding(accept_encoding: str | None, available: dict) -> str | None:
+    """Pick the content coding to send by q-value, or None if every one was refused."""
+    if not accept_encoding:
+        return "identity"
+    
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    
+    def quality_of(encoding: str) -> float:
+        if encoding in qualities:
+            return qualities[encoding]
+        if "*" in qualities:
+            return qualities["*"]
+        # identity stays acceptable unless refused by name or through *
+        return 1.0 if encoding == "identity" else 0.0
+    
+    # max() keeps the first of equal q-values, so ties go to the preferred coding
+    acceptable = [e for e in (*PREFERRED_ENCODINGS, "identity") if e in available and quality_of(e) > 0]
+    return max(acceptable, key=quality_of, default=None)
+
+def _encode_variants(body: bytes, content_type: str) -> dict[str, tuple[bytes, dict[str, str]]]:
+    """Precompress body and build the response headers of each content coding."""
+    etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+    encoded = {"identity": body, **_compress(body, DIGEST_BROTLI_QUALITY)}
+    variants = {}
+    for encoding, data in encoded.items():
+        headers = {
+            "Content-Type": content_type,
+            "Content-Length": str(len(data)),
+            # Each encoding is a distinct representation, so it gets its own ETag
+            "ETag": f'"{etag}"' if encoding == "identity" else f'"{etag}-{encoding}"',
+            "Vary": "Accept-Encoding"
+        }
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        variants[encoding] = (data, headers)
+    return variants
+
+DIGEST_TTL = 3600  # Profile data changes at most daily; the scrapers also cache for an hour
+DIGEST_REFRESH_INTERVAL = DIGEST_TTL * 0.9  # With PREWARM, refresh just before digests expire
+
+# Encoded digests as {encoding: (body, headers)} keyed by context source name,
+# with the time they were built
+_digests: dict[str, tuple[float, dict[str, tuple[bytes, dict[str, str]]]]] = {}
+
+def _store_digest(name: str, text: str) -> dict[str, tuple[bytes, dict[str, str]]]:
+    variants = _encode_variants(text.encode(), "text/plain; charset=utf-8")
+    # Failed pulls return "", which should be retried rather than cached
+    if text:
+        _digests[name] = (time.time(), variants)
+    return variants
+
+def _fresh_digest(name: str) -> dict[str, tuple[bytes, dict[str, str]]] | None:
+    cached = _digests.get(name)
+    if cached and time.time() - cached[0] < DIGEST_TTL:
+        return cached[1]
+    return None
+
+def get_digest(name: str) -> dict[str, tuple[bytes, dict[str, str]]]:
+    return _fresh_digest(name) or _store_digest(name, CONTEXT_SOURCES[name]())
+
+def _pull_digests(names: list[str]) -> list[dict[str, tuple[bytes, dict[str, str]]]]:
+    # Pull stale sources concurrently so a cold batch costs only the slowest one
+    with ThreadPoolExecutor(max_workers=len(names)) as executor:
+        return list(executor.map(get_digest, names))
+
+def _conditional_response(
+    variants: dict[str, tuple[bytes, dict[str, str]]],
+    if_none_match: str | None,
+    accept_encoding: str | None
+) -> Response:
+    encoding = _negotiate_encoding(accept_encoding, variants)
+    if encoding is None:
+        return Response(status_code=406, headers={"Vary": "Accept-Encoding"})
+    body, headers = variants[encoding]
+    if if_none_match == headers["ETag"]:
+        return Response(status_code=304, headers={"ETag": headers["ETag"], "Vary": "Accept-Encoding"})
+    return Response(content=body, headers=headers)
+
+# Warm hits are answered on the event loop; only upstream pulls take a threadpool worker
+async def digest_response(name: str, if_none_match: str | None, accept_encoding: str | None) -> Response:
+    variants = _fresh_digest(name) or await run_in_threadpool(get_digest, name)
+    return _conditional_response(variants, if_none_match, accept_encoding)
+
+# The last combined context body, keyed by the ETags of the digests it was built from
+_context: tuple[tuple[str, ...], dict[str, tuple[bytes, dict[str, str]]]] | None = None
+
+async def context_response(if_none_match: str | None, accept_encoding: str | None) -> Response:
+    global _context
+    names = list(CONTEXT_SOURCES)
+    digests = [_fresh_digest(name) for name in names]
+    if not all(digests):
+        digests = await run_in_threadpool(_pull_digests, names)
+    
+    key = tuple(variants["identity"][1]["ETag"] for variants in digests)
+    if _context is None or _context[0] != key:
+        body = orjson.dumps({name: variants["identity"][0].decode() for name, variants in zip(names, digests)})
+        _context = (key, _encode_variants(body, "application/json"))
+    
+    return _conditional_response(_context[1], if_none_match, accept_encoding)
+
+def _refresh_digests(bypass_cache: bool = False) -> None:
+    for name, text in pull_context(bypass_cache=bypass_cache).items():
+        _store_digest(name, text)
+
+def _prefetch() -> None:
+    try:
+        warm_up()
+    except Exception as e:
+        logger.warning(f"Could not build the Bedrock client ahead of time: {e}")
+    _refresh_digests()
+
+async def _keep_context_warm() -> None:
+    """Prefetch once, then refresh every digest shortly before it expires."""
+    refresh = _prefetch
+    while True:
+        # A failed pass is logged and retried on the next interval rather than
+        # ending the only warmer
+        try:
+            await run_in_threadpool(refresh)
+        except Exception as e:
+            logger.error(f"Could not warm the context digests: {e}")
+        refresh = partial(_refresh_digests, bypass_cache=True)
+        await asyncio.sleep(DIGEST_REFRESH_INTERVAL)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The only cache warmer: it runs in the background so startup (and the Lambda
+    # readiness check) is not delayed, and stops with the worker that owns it
+    warmer = asyncio.create_task(_keep_context_warm()) if os.environ.get("PREWARM") == "1" else None
+    yield
+    if warmer:
+        warmer.cancel()
+
+# Routes returning plain dicts (e.g. /health) are encoded with orjson
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 origins = [
     "http://localhost:8000",
@@ -29,15 +196,68 @@ app.add_middleware(
     allow_origins=origins,
     allow_methods=["GET", "POST", "OPTIONS"],
     allow_headers=["*"],
-    allow_credentials=True,
+    # The client sends no cookies or auth headers, so credentialed requests are never needed
+    allow_credentials=False,
     max_age=86400
 )
 
 PROJECT_ROOT = Path(__file__).parent.parent
+FRONTEND_DIR = PROJECT_ROOT / "frontend"
+
+# Images are already compressed; only text-like assets are worth encoding
+COMPRESSIBLE_TYPES = {"application/javascript", "application/json", "image/svg+xml", "image/vnd.microsoft.icon"}
+# Asset names are not content-hashed, so code must revalidate (no-cache) to pick up
+# deploys right away; images rarely change and can be reused for a day
+CACHE_POLICIES = {
+    ".png": "public, max-age=86400",
+    ".ico": "public, max-age=86400",
+}
+DEFAULT_CACHE_POLICY = "no-cache"
+
+def _load_frontend_file(path: Path) -> tuple[str, dict[str, tuple[bytes, str, dict[str, str], dict[str, str]]]]:
+    body = path.read_bytes()
+    media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+    encoded = {"identity": body}
+    
+    if media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES:
+        encoded.update(_compress(body))
+    
+    cache_control = CACHE_POLICIES.get(path.suffix, DEFAULT_CACHE_POLICY)
+    variants = {}
+    for encoding, data in encoded.items():
+        # Each encoding is a distinct representation, so it gets its own ETag
+        variant_etag = f'"{etag}"' if encoding == "identity" else f'"{etag}-{encoding}"'
+        cache_headers = {"ETag": variant_etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        headers = cache_headers if encoding == "identity" else {**cache_headers, "Content-Encoding": encoding}
+        variants[encoding] = (data, variant_etag, cache_headers, headers)
+    return media_type, variants
+
+# Frontend files held in memory as (media type, {encoding: (body, ETag, 304 headers,
+# 200 headers)}) so requests never touch the disk, compress anything or build headers;
+# dev reloads restart the server on change
+FRONTEND_CACHE = {
+    path.name: _load_frontend_file(path)
+    for path in FRONTEND_DIR.iterdir() if path.is_file()
+}
+
+def frontend_file_response(filename: str, if_none_match: str | None, accept_encoding: str | None) -> Response:
+    if filename not in FRONTEND_CACHE:
+        return Response(status_code=404)
+    
+    media_type, variants = FRONTEND_CACHE[filename]
+    encoding = _negotiate_encoding(accept_encoding, variants)
+    if encoding is None:
+        return Response(status_code=406, headers={"Vary": "Accept-Encoding"})
+    body, etag, cache_headers, headers = variants[encoding]
+    
+    if if_none_match == etag:
+        return Response(status_code=304, headers=cache_headers)
+    return Response(content=body, media_type=media_type, headers=headers)
 
 @app.get("/")
-async def read_root():
-    return FileResponse(str(PROJECT_ROOT / "frontend" / "index.html"))
+async def read_root(if_none_match: str | None = Header(None), accept_encoding: str | None = Header(None)):
+    return frontend_file_response("index.html", if_none_match, accept_encoding)
 
 @app.get("/health")
 async def health_check():
@@ -47,84 +267,95 @@ async def health_check():
     }
 
 @app.get("/{filename}")
-async def serve_frontend_files(filename: str):
-    if filename in ["apple-touch-icon.png", "apple-touch-icon-precomposed.png"]:
-        return Response(status_code=404)
-    
-    cache_headers = {
-        "Cache-Control": f"no-cache, {'must-revalidate' if filename == 'favicon.ico' else 'no-store, must-revalidate'}",
-        "Pragma": "no-cache",
-        "Expires": "0"
-    }
-    
-    return FileResponse(
-        str(PROJECT_ROOT / "frontend" / filename),
-        headers=cache_headers
-    )
+async def serve_frontend_files(
+    filename: str,
+    if_none_match: str | None = Header(None),
+    accept_encoding: str | None = Header(None)
+):
+    return frontend_file_response(filename, if_none_match, accept_encoding)
 
 @app.get("/api/resume")
-async def send_resume():
-    return Response(
-        content=pull_resume(),
-        media_type="text/plain",
-        headers={
-            "Content-Type": "text/plain; charset=utf-8"
-        }
-    )
+async def send_resume(if_none_match: str | None = Header(None), accept_encoding: str | None = Header(None)):
+    return await digest_response("resume", if_none_match, accept_encoding)
 
 @app.get("/api/github")
-def pull_github_digest():
-    return Response(
-        content=pull_github(),
-        media_type="text/plain",
-        headers={
-            "Content-Type": "text/plain; charset=utf-8"
-        }
-    )
+async def pull_github_digest(if_none_match: str | None = Header(None), accept_encoding: str | None = Header(None)):
+    return await digest_response("github", if_none_match, accept_encoding)
 
 @app.get("/api/linkedin")
-def get_linkedin_digest():
-    return Response(
-        content=pull_linkedin(),
-        media_type="text/plain",
-        headers={
-            "Content-Type": "text/plain; charset=utf-8"
-        }
-    )
+async def get_linkedin_digest(if_none_match: str | None = Header(None), accept_encoding: str | None = Header(None)):
+    return await digest_response("linkedin", if_none_match, accept_encoding)
+
+# All three digests in one round trip for the client's startup
+@app.get("/api/context")
+async def get_context(if_none_match: str | None = Header(None), accept_encoding: str | None = Header(None)):
+    return await context_response(if_none_match, accept_encoding)
+
+# The prompt config is static, so serialize it once
+PROMPT_CONFIG_BYTES = orjson.dumps(get_prompt_config())
+PROMPT_CONFIG_HEADERS = {
+    "ETag": f'"{hashlib.blake2b(PROMPT_CONFIG_BYTES, digest_size=8).hexdigest()}"',
+    "Cache-Control": "public, max-age=300"
+}
 
 @app.get("/api/prompt_config")
-async def prompt_config_route():
+async def prompt_config_route(if_none_match: str | None = Header(None)):
+    if if_none_match == PROMPT_CONFIG_HEADERS["ETag"]:
+        return Response(status_code=304, headers=PROMPT_CONFIG_HEADERS)
     return Response(
-        content=json.dumps(get_prompt_config()),
-        media_type="application/json"
+        content=PROMPT_CONFIG_BYTES,
+        media_type="application/json",
+        headers=PROMPT_CONFIG_HEADERS
     )
 
+# Response copies the headers it is given, so one constant dict serves every stream
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'Connection': 'keep-alive',
+    'X-Accel-Buffering': 'no'
+}
+
 @app.post("/api/chat")
-async def chat_completion(request: ChatRequest):
+async def chat_completion(request: Request):
+    # Decode the body straight to dicts instead of building and dumping Pydantic models
+    try:
+        messages = orjson.loads(await request.body())["messages"]
+    except (orjson.JSONDecodeError, KeyError, TypeError):
+        raise HTTPException(status_code=422, detail="Expected a JSON object with a messages list")
+    if not isinstance(messages, list) or not all(
+        isinstance(msg, dict) and isinstance(msg.get("role"), str) and isinstance(msg.get("content"), str)
+        for msg in messages
+    ):
+        raise HTTPException(status_code=422, detail="Each message needs a string role and content")
+    
     try:
-        messages = [msg.model_dump() for msg in request.messages]
         return StreamingResponse(
             generate_stream(messages),
             media_type="text/event-stream",
-            headers={
-                'Cache-Control': 'no-cache',
-                'Connection': 'keep-alive',
-                'X-Accel-Buffering': 'no',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': '*'
-            }
+            headers=SSE_HEADERS
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 if __name__ == "__main__":
     import uvicorn
+    
+    # Auto-reload is for local development and cannot be combined with multiple workers
+    if os.environ.get("DEV") == "1":
+        process_options = {
+            "reload": True,
+            "reload_excludes": ["*.pyc", "*.log"],
+            "reload_includes": ["*.py", "*.html", "*.css", "*.js", "*.ico"],
+        }
+    else:
+        process_options = {
+            "workers": int(os.environ.get("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1))
+        }
+    
+    # uvicorn's defaults already run on uvloop and httptools when they are installed
     uvicorn.run(
         "server:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
-        reload_excludes=["*.pyc", "*.log"],
-        reload_includes=["*.py", "*.html", "*.css", "*.js", "*.ico"],
-    )
\ No newline at end of file
+        **process_options,
+    )
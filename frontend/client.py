@@ -1,50 +1,60 @@
 import json
 import codecs
+import asyncio
 from urllib.request import fetch
-from typing import Tuple, AsyncIterator
+from typing import Dict, List, Tuple, AsyncIterator
         
 class Context:
     SOURCES = {
         'Resume': {
-            'url': '/api/resume',
+            'key': 'resume',
             'display_url': 'https://resume.alexbasile.com'
         },
         'LinkedIn': {
-            'url': '/api/linkedin',
+            'key': 'linkedin',
             'display_url': 'https://www.linkedin.com/in/awbasile'
         },
         'GitHub': {
-            'url': '/api/github',
+            'key': 'github',
             'display_url': 'https://github.com/anotherbazeinthewall'
         }
     }
 
-    @classmethod
-    async def initialize(cls) -> Tuple[str, str]:
-        """Returns system prompt and initial message with all context incorporated"""
-        # Fetch prompt config first
+    @staticmethod
+    async def _fetch_prompt_config() -> Tuple[str, str]:
         try:
             prompt_response = await fetch("/api/prompt_config")
             prompt_config = await prompt_response.json()
-            system_prompt_template = prompt_config["system_prompt"]
-            initial_message = prompt_config["initial_message"]
+            return prompt_config["system_prompt"], prompt_config["initial_message"]
         except Exception as e:
             print(f"Error fetching prompt configuration: {str(e)}")
-            system_prompt_template = "You are Alex Basile."
-            initial_message = "Tell me a joke about technical difficulties."
+            return "You are Alex Basile.", "Tell me a joke about technical difficulties."
+
+    @staticmethod
+    async def _fetch_context() -> Dict[str, str]:
+        try:
+            return await (await fetch("/api/context")).json()
+        except Exception as e:
+            print(f"Error fetching context: {str(e)}")
+            return {}
 
-        # Then fetch context sequentially
-        context_values = []
+    @classmethod
+    async def initialize(cls) -> Tuple[str, str]:
+        """Returns system prompt and initial message with all context incorporated"""
         for name, source in cls.SOURCES.items():
-            try:
-                print(f'\u001b[90mRetrieving {name}: \u001b[1m\u001b[4m{source["display_url"]}\u001b[0m\n')
-                content = await (await fetch(source['url'])).string()
-                context_values.append(content)
-            except Exception as e:
-                print(f"Error fetching {name} context: {str(e)}")
-                continue
+            print(f'\u001b[90mRetrieving {name}: \u001b[1m\u001b[4m{source["display_url"]}\u001b[0m\n')
+
+        # The prompt config and the batched context are independent, so fetch them concurrently
+        (system_prompt_template, initial_message), context = await asyncio.gather(
+            cls._fetch_prompt_config(),
+            cls._fetch_context()
+        )
+        context_values = [context[source['key']] for source in cls.SOURCES.values() if source['key'] in context]
                 
-        system_prompt = system_prompt_template.format(resources="\n".join(context_values))
+        # Splice the context in at the placeholder; unlike format() this leaves any
+        # other braces in the template (or the digests) alone
+        prefix, _, suffix = system_prompt_template.partition("{resources}")
+        system_prompt = "".join((prefix, "\n".join(context_values), suffix))
         return system_prompt, initial_message
 
 class StreamProcessor:
@@ -55,27 +65,42 @@ class StreamProcessor:
     def new(encoding):
         return globals()['self'].TextDecoder.new(encoding)
 
+    @staticmethod
+    def _parse_frames(frames: List[str]) -> List[dict]:
+        # One json.loads over the whole read instead of one per token; a bad frame
+        # falls back to parsing individually so the good ones survive
+        try:
+            return json.loads(f"[{','.join(frames)}]")
+        except json.JSONDecodeError:
+            payloads = []
+            for frame in frames:
+                try:
+                    payloads.append(json.loads(frame))
+                except json.JSONDecodeError:
+                    pass
+            return payloads
+
     async def process_stream(self, response) -> AsyncIterator[str]:
         reader = response.js_response.body.getReader()
-        buffer, first_chunk = "", True
+        tail, first_chunk = "", True
         
         while True:
             if (chunk := await reader.read()).done: break
-            buffer += self.decoder.decode(chunk.value, {"stream": True})
+            # Only the unterminated last line is carried over to the next chunk
+            *lines, tail = (tail + self.decoder.decode(chunk.value, {"stream": True})).split('\n')
             
-            while 'data: ' in buffer:
-                if (end := buffer.find('\n', start := buffer.find('data: '))) == -1: break
-                if (data := buffer[start + 6:end].strip()) == '[DONE]':
-                    buffer = buffer[end + 1:]
-                    continue
-                    
-                try:
-                    if content := json.loads(data).get('choices', [{}])[0].get('delta', {}).get('content', ''):
-                        yield content.lstrip() if first_chunk else content
-                        first_chunk = False
-                except json.JSONDecodeError:
-                    pass
-                buffer = buffer[end + 1:]
+            # [DONE] and [ERROR] sentinels are not JSON objects and are skipped here
+            frames = [line[6:] for line in lines if line.startswith('data: {')]
+            contents = [
+                content for payload in self._parse_frames(frames)
+                if (content := payload.get('choices', [{}])[0].get('delta', {}).get('content', ''))
+            ]
+            
+            # Yield one string per network read so each read costs a single terminal write
+            if contents:
+                text = "".join(contents)
+                yield text.lstrip() if first_chunk else text
+                first_chunk = False
 
 class ChatInterface:
     codecs.StreamDecoder = StreamProcessor
@@ -101,19 +126,19 @@ class ChatInterface:
             "/api/chat",
             method="POST",
             headers={"Content-Type": "application/json", "Accept": "text/event-stream"},
-            body=json.dumps({"messages": self.conversation.messages})
+            body=self.conversation.request_body()
         )
     
     async def _handle_stream(self, response, accumulate=False):
-        accumulated = ""
+        accumulated = []
         async for content in self.stream_processor.process_stream(response):
             if accumulate:
-                accumulated += content
+                accumulated.append(content)
             self._print_content(content)
         
         self._print_completion()
         if accumulate:
-            self.conversation.add_message("assistant", accumulated)
+            self.conversation.add_message("assistant", "".join(accumulated))
     
     def _print_content(self, content: str):
         print('\n' if content == '\n' else f'\033[92m{content}\033[0m')
@@ -138,21 +163,28 @@ class ChatInterface:
 class Conversation:
     def __init__(self):
         self.messages = []
+        # JSON for each message, encoded once so a turn only serializes what is new
+        self._encoded = []
         
     async def initialize(self):
         system_prompt, initial_message = await Context.initialize()
         
         self.base_system_prompt = system_prompt
-        self.messages = [
-            {"role": "system", "content": self.base_system_prompt},
-            {"role": "user", "content": initial_message}
-        ]
+        self.messages, self._encoded = [], []
+        self.add_message("system", self.base_system_prompt)
+        self.add_message("user", initial_message)
 
     def add_message(self, role: str, content: str):
-        self.messages.append({"role": role, "content": content})
+        message = {"role": role, "content": content}
+        self.messages.append(message)
+        self._encoded.append(json.dumps(message))
 
     def reset_system_prompt(self):
         self.messages[0]["content"] = self.base_system_prompt
+        self._encoded[0] = json.dumps(self.messages[0])
+
+    def request_body(self) -> str:
+        return '{"messages": [' + ', '.join(self._encoded) + ']}'
 
 async def main():
     chat_interface = ChatInterface()